@@ -1,137 +1,205 @@
 #!/usr/bin/env python3
 
+import contextlib
 import csv
 import json
+import shutil
+import sys
+import tempfile
+from collections import Counter
 from pathlib import Path
 
-def convert_csv_to_json(csv_file_path, json_file_path):
-    """Convert CSV recipe data to structured JSON format"""
+from recipe_io import encode_json
+from recipe_sources import open_sources, resolve_source
+
+def spool_array_item(spool_file, obj):
+    """Append obj to spool_file as the next item of an indent=2 array nested one level deep"""
+    separator = b",\n    " if spool_file.tell() else b"\n    "
+    spool_file.write(separator + encode_json(obj).replace(b"\n", b"\n    "))
+
+def write_json_with_spooled_array(path, head, key, spool_file):
+    """Write head as indent=2 JSON with a final key whose array items were spooled to spool_file"""
+    with open(path, 'wb') as jsonfile:
+        jsonfile.write(encode_json(head)[:-2] + f',\n  "{key}": ['.encode('utf-8'))
+        if spool_file.tell():
+            spool_file.seek(0)
+            shutil.copyfileobj(spool_file, jsonfile)
+            jsonfile.write(b"\n  ]\n}")
+        else:
+            jsonfile.write(b"]\n}")
+
+def iter_recipes(csv_file_path):
+    """Yield structured recipe records from a recipe CSV, one row at a time"""
     
-    recipes = []
+    # Recipe source code can exceed the default csv field size limit
+    csv.field_size_limit(sys.maxsize)
     
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
+    # Source code may live in a sidecar archive, referenced from the CSV
+    with open(csv_file_path, 'r', encoding='utf-8') as csvfile, \
+         (open_sources(csv_file_path) or contextlib.nullcontext()) as sources:
+        reader = csv.reader(csvfile)
         
-        for row_num, row in enumerate(reader):
+        # Resolve column positions once instead of building a dict per row
+        header = next(reader, None)
+        # An empty file has no header and no recipes
+        if header is None:
+            return
+        name_col = header.index('Recipe name')
+        description_col = header.index('Recipe description')
+        type_col = header.index('Recipe type')
+        source_col = header.index('Recipe source code')
+        options_col = header.index('Recipe options')
+        # Handle files with/without repository column
+        repository_col = header.index('Repository') if 'Repository' in header else None
+        
+        # Blank lines are skipped, as csv.DictReader does
+        for row_num, row in enumerate(row for row in reader if row):
             # Skip the header description row
-            if row_num == 0 and row['Recipe name'] == 'The name of the recipe.':
+            if row_num == 0 and row[name_col] == 'The name of the recipe.':
                 continue
             
             # Parse recipe options (if it's valid JSON)
             try:
-                options = json.loads(row['Recipe options']) if row['Recipe options'].strip() else {}
+                options = json.loads(row[options_col]) if row[options_col].strip() else {}
             except json.JSONDecodeError:
                 options = {}
             
-            recipe = {
+            source_code = resolve_source(sources, row[source_col], csv_file_path)
+            source_length = len(source_code)
+            description = row[description_col]
+            
+            yield {
                 "id": row_num,  # Add unique ID
-                "name": row['Recipe name'],
-                "description": row['Recipe description'],
-                "type": row['Recipe type'],
-                "sourceCode": row['Recipe source code'],
+                "name": row[name_col],
+                "description": description,
+                "type": row[type_col],
+                "sourceCode": source_code,
                 "options": options,
-                "repository": row.get('Repository', 'unknown'),  # Handle files with/without repository column
+                "repository": row[repository_col] if repository_col is not None else 'unknown',
                 "metadata": {
-                    "sourceCodeLength": len(row['Recipe source code']),
-                    "hasDescription": bool(row['Recipe description'].strip()),
+                    "sourceCodeLength": source_length,
+                    "hasDescription": bool(description) and not description.isspace(),
                     "hasOptions": bool(options),
-                    "estimatedTokens": len(row['Recipe source code']) // 4  # Rough estimate
+                    "estimatedTokens": source_length // 4  # Rough estimate
                 }
             }
-            
-            recipes.append(recipe)
+
+def convert_csv_to_json(csv_file_path, json_file_path, training_file_path=None):
+    """Convert CSV recipe data to structured JSON format
     
-    # Create structured output with metadata
-    output = {
-        "metadata": {
-            "extractionDate": "2025-09-16",
-            "totalRecipes": len(recipes),
-            "sourceFormat": "OpenRewrite Recipe Collection",
-            "description": "Comprehensive collection of OpenRewrite recipes for Java code transformation and repair"
-        },
-        "statistics": generate_statistics(recipes),
-        "recipes": recipes
-    }
+    Recipes are spooled to a temporary file as they are parsed and stitched
+    in after the header, so only the statistics stay in memory. When
+    training_file_path is given, the training format is written from the
+    same pass over the CSV. Returns the metadata and statistics sections.
+    """
     
-    # Write to JSON file
-    with open(json_file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(output, jsonfile, indent=2, ensure_ascii=False)
+    with tempfile.TemporaryFile() as recipes_file, tempfile.TemporaryFile() as training_file:
+        
+        def spool(recipes):
+            for recipe in recipes:
+                spool_array_item(recipes_file, recipe)
+                if training_file_path is not None:
+                    spool_array_item(training_file, training_example(recipe))
+                yield recipe
+        
+        statistics = generate_statistics(spool(iter_recipes(csv_file_path)))
+        
+        # Create structured output with metadata
+        output = {
+            "metadata": {
+                "extractionDate": "2025-09-16",
+                "totalRecipes": statistics["totalRecipes"],
+                "sourceFormat": "OpenRewrite Recipe Collection",
+                "description": "Comprehensive collection of OpenRewrite recipes for Java code transformation and repair"
+            },
+            "statistics": statistics
+        }
+        
+        # Write to JSON file: header, spooled recipes, footer
+        write_json_with_spooled_array(json_file_path, output, "recipes", recipes_file)
+        
+        if training_file_path is not None:
+            write_training_format(training_file_path, statistics["totalRecipes"], training_file)
     
-    print(f"✅ Converted {len(recipes)} recipes to JSON")
+    print(f"✅ Converted {statistics['totalRecipes']} recipes to JSON")
     print(f"📄 Output file: {json_file_path}")
+    if training_file_path is not None:
+        print(f"✅ Created training format with {statistics['totalRecipes']} examples")
+        print(f"📄 Training file: {training_file_path}")
     return output
 
 def generate_statistics(recipes):
-    """Generate statistics about the recipe collection"""
-    
-    stats = {
-        "totalRecipes": len(recipes),
-        "recipeTypes": {},
-        "repositories": {},
-        "averageSourceCodeLength": 0,
-        "totalSourceCodeLength": 0,
-        "recipesWithDescriptions": 0,
-        "recipesWithOptions": 0,
-        "estimatedTotalTokens": 0
-    }
+    """Generate statistics about the recipe collection in a single pass over recipes"""
     
+    recipe_types = Counter()
+    repositories = Counter()
+    total_recipes = 0
     total_length = 0
+    with_descriptions = 0
+    with_options = 0
+    estimated_tokens = 0
     
     for recipe in recipes:
-        # Count by type
-        recipe_type = recipe["type"]
-        stats["recipeTypes"][recipe_type] = stats["recipeTypes"].get(recipe_type, 0) + 1
-        
-        # Count by repository
-        repository = recipe["repository"]
-        stats["repositories"][repository] = stats["repositories"].get(repository, 0) + 1
-        
-        # Calculate lengths and counts
-        source_length = len(recipe["sourceCode"])
-        total_length += source_length
+        metadata = recipe["metadata"]
+        total_recipes += 1
         
-        if recipe["description"].strip():
-            stats["recipesWithDescriptions"] += 1
+        # Count by type and by repository
+        recipe_types[recipe["type"]] += 1
+        repositories[recipe["repository"]] += 1
         
-        if recipe["options"]:
-            stats["recipesWithOptions"] += 1
-        
-        stats["estimatedTotalTokens"] += recipe["metadata"]["estimatedTokens"]
-    
-    stats["averageSourceCodeLength"] = total_length // len(recipes) if recipes else 0
-    stats["totalSourceCodeLength"] = total_length
-    
-    return stats
+        # Calculate lengths and counts, reusing the per-recipe metadata
+        total_length += metadata["sourceCodeLength"]
+        with_descriptions += metadata["hasDescription"]
+        with_options += metadata["hasOptions"]
+        estimated_tokens += metadata["estimatedTokens"]
+    
+    return {
+        "totalRecipes": total_recipes,
+        "recipeTypes": dict(recipe_types),
+        "repositories": dict(repositories),
+        "averageSourceCodeLength": total_length // total_recipes if total_recipes else 0,
+        "totalSourceCodeLength": total_length,
+        "recipesWithDescriptions": with_descriptions,
+        "recipesWithOptions": with_options,
+        "estimatedTotalTokens": estimated_tokens
+    }
+
+def training_example(recipe):
+    """Build the instruction-tuning example for a single recipe"""
+    return {
+        "instruction": f"Create a recipe that {recipe['description'].lower()}",
+        "input": f"Recipe type: {recipe['type']}",
+        "output": recipe['sourceCode'],
+        "metadata": {
+            "recipeName": recipe['name'],
+            "recipeType": recipe['type'],
+            "repository": recipe['repository']
+        }
+    }
+
+def write_training_format(output_file, total_examples, spool_file):
+    """Write the training format file around examples spooled to spool_file"""
+    write_json_with_spooled_array(output_file, {
+        "metadata": {
+            "format": "instruction_tuning",
+            "description": "OpenRewrite recipes formatted for LLM fine-tuning",
+            "totalExamples": total_examples
+        }
+    }, "data", spool_file)
 
 def create_training_format(recipes, output_file):
     """Create a simplified format optimized for LLM training"""
     
-    training_data = []
-    
-    for recipe in recipes:
-        training_example = {
-            "instruction": f"Create a recipe that {recipe['description'].lower()}",
-            "input": f"Recipe type: {recipe['type']}",
-            "output": recipe['sourceCode'],
-            "metadata": {
-                "recipeName": recipe['name'],
-                "recipeType": recipe['type'],
-                "repository": recipe['repository']
-            }
-        }
-        training_data.append(training_example)
+    total_examples = 0
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            "metadata": {
-                "format": "instruction_tuning",
-                "description": "OpenRewrite recipes formatted for LLM fine-tuning",
-                "totalExamples": len(training_data)
-            },
-            "data": training_data
-        }, f, indent=2, ensure_ascii=False)
+    with tempfile.TemporaryFile() as training_file:
+        for recipe in recipes:
+            spool_array_item(training_file, training_example(recipe))
+            total_examples += 1
+        
+        write_training_format(output_file, total_examples, training_file)
     
-    print(f"✅ Created training format with {len(training_data)} examples")
+    print(f"✅ Created training format with {total_examples} examples")
     print(f"📄 Training file: {output_file}")
 
 def main():
@@ -151,11 +219,9 @@ def main():
     # Convert comprehensive dataset
     if comprehensive_csv.exists():
         print(f"\n📊 Converting comprehensive dataset: {comprehensive_csv}")
-        comprehensive_data = convert_csv_to_json(comprehensive_csv, comprehensive_json)
-        
-        # Create training format
+        # Create the training format from the same pass over the CSV
         training_json = base_path / "RewriteRecipes_training_format.json"
-        create_training_format(comprehensive_data["recipes"], training_json)
+        comprehensive_data = convert_csv_to_json(comprehensive_csv, comprehensive_json, training_json)
         
         print(f"\n📈 COMPREHENSIVE DATASET STATS:")
         stats = comprehensive_data["statistics"]
@@ -15,42 +15,105 @@ Usage:
 """
 
 import argparse
+import contextlib
 import csv
 import json
 import re
 import sys
+from hashlib import blake2b
 from pathlib import Path
 from typing import Optional
 
+from recipe_sources import open_sources, resolve_source
+
+# Optional JIT fast path for normalize_whitespace (numba + numpy)
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    njit = None
+
 # ---------- Utilities ----------
 
+_BLANK_LINES_RE = re.compile(r"\n{4,}")  # three or more blank lines
+
+def _normalize_ascii_lines(buf, out) -> int:
+    """Single-pass normalize_whitespace over ASCII bytes, writing into out.
+
+    Folds CR/CRLF to LF, drops trailing whitespace on each line and keeps at
+    most 2 consecutive blank lines. Returns the number of bytes written; the
+    caller still strips the ends. Compiled with numba when it is installed.
+    """
+    size = buf.shape[0]
+    n = 0
+    line_start = 0
+    content_end = 0
+    blank_count = 0
+    for i in range(size + 1):
+        if i < size:
+            c = buf[i]
+            if c == 13:  # '\r'
+                if i + 1 < size and buf[i + 1] == 10:
+                    continue
+                c = 10
+            if c != 10:
+                out[n] = c
+                n += 1
+                # ASCII characters for which str.isspace() is true
+                if not (c == 32 or 9 <= c <= 13 or 28 <= c <= 31):
+                    content_end = n
+                continue
+        # End of a line (or of the input): drop trailing whitespace, or the
+        # whole line if it is a third consecutive blank one
+        if content_end == line_start:
+            blank_count += 1
+        else:
+            blank_count = 0
+        if blank_count <= 2:
+            n = content_end
+            if i < size:
+                out[n] = 10
+                n += 1
+        else:
+            n = line_start
+        line_start = n
+        content_end = n
+    return n
+
+_normalize_ascii_kernel = njit(cache=True)(_normalize_ascii_lines) if njit is not None else None
+
 def normalize_whitespace(s: str) -> str:
     """Collapse multiple spaces/tabs and normalize newlines."""
     if s is None:
         return ""
+    # JIT-compiled path; non-ASCII text needs str.rstrip's Unicode whitespace rules
+    if _normalize_ascii_kernel is not None and s.isascii():
+        buf = np.frombuffer(s.encode("ascii"), dtype=np.uint8)
+        out = np.empty_like(buf)
+        n = _normalize_ascii_kernel(buf, out)
+        return out[:n].tobytes().decode("ascii").strip()
     # Normalize CRLF to LF
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
+    if "\r" in s:
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
     # Remove trailing/leading whitespace on each line but keep line breaks
-    lines = [line.rstrip() for line in s.split("\n")]
-    # Collapse multiple blank lines to a maximum of 2
-    out_lines = []
-    blank_count = 0
-    for line in lines:
-        if line.strip() == "":
-            blank_count += 1
-        else:
-            blank_count = 0
-        if blank_count <= 2:
-            out_lines.append(line)
-    return "\n".join(out_lines).strip()
+    s = "\n".join([line.rstrip() for line in s.split("\n")])
+    # Collapse multiple blank lines to a maximum of 2 (the substring check
+    # skips the regex scan for the common case of nothing to collapse)
+    if "\n\n\n\n" in s:
+        s = _BLANK_LINES_RE.sub("\n\n\n", s)
+    return s.strip()
 
-_LICENSE_COMMENT_RE = re.compile(r"(?s)/\*.*?\*/\s*")  # matches /* ... */ blocks (multiline)
+_LICENSE_COMMENT_RE = re.compile(r"(?s)\A/\*.*?\*/\s*")  # matches a leading /* ... */ block (multiline)
 
 def strip_license_header(code: str) -> str:
     """Remove a leading C-style license block (/* ... */) if present."""
     if not code:
         return code
-    return _LICENSE_COMMENT_RE.sub("", code, count=1).lstrip()
+    code = code.lstrip()
+    # Cheap rejection before the regex for code without a leading comment
+    if not code.startswith("/*"):
+        return code
+    return _LICENSE_COMMENT_RE.sub("", code, count=1)
 
 def safe_truncate_text(text: str, max_chars: int) -> str:
     """Truncate conservatively on character boundary and append a marker."""
@@ -64,6 +127,14 @@ def estimate_tokens_by_whitespace(text: str) -> int:
         return 0
     return max(1, len(text.split()))
 
+def dedupe_key(record: dict) -> bytes:
+    """16-byte digest of the stripped instruction + response, so the seen-set stays small."""
+    h = blake2b(digest_size=16)
+    h.update(record["instruction"].strip().encode("utf-8"))
+    h.update(b"\x1f")  # unit separator between the two fields
+    h.update(record["response"].strip().encode("utf-8"))
+    return h.digest()
+
 # ---------- Prompt construction (expert templates) ----------
 
 INSTRUCTION_TEMPLATE = (
@@ -133,16 +204,37 @@ def build_example(
     if max_response_chars is not None:
         response = safe_truncate_text(response, max_response_chars)
 
-    example = {
+    return {
         "instruction": instruction,
         # include an 'input' field for Alpaca-style compatibility (left empty)
         "input": "",
         "response": response
     }
-    return example
 
 # ---------- CSV reading & writing ----------
 
+WRITE_BUFFER_SIZE = 1 << 20  # bytes buffered by the output file
+WRITE_BATCH_SIZE = 1024      # records joined into a single write() call
+
+def resolve_columns(header: list, field_map: dict) -> tuple:
+    """Resolve the mapped field names to CSV column indices, once per file.
+
+    Columns missing from the header resolve to ``len(header)``, one past the
+    last real column; rows are padded with an empty string at that position.
+    """
+    index = {column: i for i, column in enumerate(header)}
+    missing = len(header)
+    return tuple(
+        index.get(field_map.get(field, default), missing)
+        for field, default in (
+            ("name", "Name"),
+            ("description", "Description"),
+            ("recipe_type", "Recipe type"),
+            ("source_code", "Source code preview"),
+            ("recipe_options", "Recipe Options"),
+        )
+    )
+
 def convert_csv_to_jsonl(
     input_path: Path,
     output_path: Path,
@@ -153,21 +245,35 @@ def convert_csv_to_jsonl(
     include_options_in_instruction: bool,
     deduplicate: bool
 ):
+    # Recipe source code can exceed the default csv field size limit
+    csv.field_size_limit(sys.maxsize)
     seen = set()
     written = 0
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    batch = []
+    # Source code may live in a sidecar archive, referenced from the CSV
     with input_path.open(newline="", encoding="utf-8") as csvfile, \
-         output_path.open("w", encoding="utf-8") as out_f:
-        reader = csv.DictReader(csvfile)
-        for row_idx, row in enumerate(reader, start=1):
-            # Map fields with fallback
-            name = row.get(field_map.get("name", "Name"), "").strip()
-            description = row.get(field_map.get("description", "Description"), "")
-            recipe_type = row.get(field_map.get("recipe_type", "Recipe type"), "")
-            source_code = row.get(field_map.get("source_code", "Source code preview"), "")
-            recipe_options = row.get(field_map.get("recipe_options", "Recipe Options"), "")
-
-            if not (name or description or source_code):
-                # skip empty rows
+         (open_sources(input_path) or contextlib.nullcontext()) as sources, \
+         output_path.open("w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as out_f:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        width = len(header) + 1
+        name_col, description_col, recipe_type_col, source_code_col, options_col = \
+            resolve_columns(header, field_map)
+        for row in reader:
+            # Pad short rows (and the missing-column slot) with empty strings
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            # Map fields with fallback; name is normalized in build_example
+            name = row[name_col]
+            description = row[description_col]
+            recipe_type = row[recipe_type_col]
+            source_code = resolve_source(sources, row[source_code_col], input_path)
+            recipe_options = row[options_col]
+
+            # skip empty rows (a whitespace-only name counts as empty; it is
+            # only stripped when the other fields are empty too)
+            if not (description or source_code or name.strip()):
                 continue
 
             record = build_example(
@@ -182,15 +288,21 @@ def convert_csv_to_jsonl(
             )
 
             # Deduplicate by instruction + response hash
-            key = (record["instruction"].strip(), record["response"].strip())
             if deduplicate:
-                keyh = json.dumps(key, ensure_ascii=False)
-                if keyh in seen:
+                key = dedupe_key(record)
+                if key in seen:
                     continue
-                seen.add(keyh)
+                seen.add(key)
+
+            batch.append(encode(record))
+            if len(batch) >= WRITE_BATCH_SIZE:
+                out_f.write("\n".join(batch) + "\n")
+                written += len(batch)
+                batch.clear()
 
-            out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
-            written += 1
+        if batch:
+            out_f.write("\n".join(batch) + "\n")
+            written += len(batch)
 
     print(f"Wrote {written} records to {output_path}", file=sys.stderr)
 
@@ -1,54 +1,112 @@
 #!/usr/bin/env python3
 
+import argparse
+import contextlib
 import os
 import re
 import json
 import csv
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+from recipe_io import iter_java_files, read_recipe_source, write_json
+from recipe_sources import sources_archive_path, store_source
+
+# Optional DFA-based scanners for recipe discovery; re is the fallback
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+_RECIPE_CLASS_PATTERN = rb'class\s+\w+\s+extends\s+(?:Scanning)?Recipe\b'
+
+# Class name, display name and description in one scan; each alternative
+# carries exactly one named group, so match.lastgroup says which one hit
+_RECIPE_INFO_RE = re.compile(
+    r'(?:public\s+)?(?:abstract\s+)?class\s+(?P<className>\w+)\s+extends\s+(?:Recipe|ScanningRecipe)'
+    r'|getDisplayName\(\)\s*\{\s*return\s+"(?P<displayName>[^"]+)"'
+    r'|getDescription\(\)\s*\{\s*return\s+"(?P<description>[^"]+)"'
+)
+
+_OPTION_RE = re.compile(r'@Option\s*\([^)]+\)\s*(?:\w+\s+)*(\w+)\s+(\w+);')
+
+def recipe_class_matcher():
+    """Return a predicate telling whether raw file bytes (or an mmap) declare a Recipe subclass.
+
+    Uses Hyperscan when installed, then RE2, then the stdlib re module. A
+    Hyperscan database owns a single scratch space, so build one matcher per
+    thread rather than sharing it.
+    """
+    if hyperscan is not None:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[_RECIPE_CLASS_PATTERN],
+            ids=[1],
+            elements=1,
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH]
+        )
+        
+        def matches(data):
+            hits = []
+            database.scan(bytes(data), match_event_handler=lambda *_: hits.append(True))
+            return bool(hits)
+        
+        return matches
+    
+    if re2 is not None:
+        search = re2.compile(_RECIPE_CLASS_PATTERN).search
+        return lambda data: search(bytes(data))
+    
+    # The stdlib engine scans any buffer, including an mmap, without copying it
+    return re.compile(_RECIPE_CLASS_PATTERN).search
+
 def find_recipe_files(root_dir):
-    """Find all Java files that extend Recipe"""
+    """Find all Java files that extend Recipe, returning (file_path, content) pairs"""
     recipe_files = []
+    is_recipe_source = recipe_class_matcher()
     
-    for root, dirs, files in os.walk(root_dir):
-        # Skip build directories and other non-source directories
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'build' and d != 'target']
-        
-        for file in files:
-            if file.endswith('.java'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        # Look for classes that extend Recipe
-                        if re.search(r'class\s+\w+\s+extends\s+Recipe\b', content) or \
-                           re.search(r'class\s+\w+\s+extends\s+ScanningRecipe\b', content):
-                            recipe_files.append(file_path)
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
+    for file_path in iter_java_files(root_dir):
+        try:
+            # Look for classes that extend Recipe; rejected files are never decoded
+            data = read_recipe_source(file_path, is_recipe_source)
+            if data is not None:
+                content = data.decode('utf-8')
+                # Same newline translation as reading in text mode
+                if '\r' in content:
+                    content = content.replace('\r\n', '\n').replace('\r', '\n')
+                recipe_files.append((file_path, content))
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
     
     return recipe_files
 
-def extract_recipe_info(file_path):
-    """Extract recipe information from a Java file"""
+def extract_recipe_info(file_path, content):
+    """Extract recipe information from the already-read content of a Java file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract class name
-        class_match = re.search(r'(?:public\s+)?(?:abstract\s+)?class\s+(\w+)\s+extends\s+(?:Recipe|ScanningRecipe)', content)
-        if not class_match:
+        # A recipe class declaration always contains 'extends'
+        if 'extends' not in content:
             return None
         
-        class_name = class_match.group(1)
+        # Extract class name, getDisplayName() and getDescription() in one pass,
+        # keeping the first occurrence of each
+        found = {}
+        for match in _RECIPE_INFO_RE.finditer(content):
+            found.setdefault(match.lastgroup, match.group(match.lastgroup))
+            if len(found) == 3:
+                break
         
-        # Extract display name from getDisplayName() method
-        display_name_match = re.search(r'getDisplayName\(\)\s*\{\s*return\s+"([^"]+)"', content)
-        display_name = display_name_match.group(1) if display_name_match else class_name
+        if 'className' not in found:
+            return None
         
-        # Extract description from getDescription() method
-        description_match = re.search(r'getDescription\(\)\s*\{\s*return\s+"([^"]+)"', content)
-        description = description_match.group(1) if description_match else ""
+        class_name = found['className']
+        display_name = found.get('displayName', class_name)
+        description = found.get('description', "")
         
         # Determine recipe type based on content and path
         recipe_type = "Java"
@@ -67,12 +125,12 @@ def extract_recipe_info(file_path):
         
         # Extract options (simplified)
         options = "{}"
-        option_matches = re.findall(r'@Option\s*\([^)]+\)\s*(?:\w+\s+)*(\w+)\s+(\w+);', content)
-        if option_matches:
-            options_dict = {}
-            for option_match in option_matches:
-                options_dict[option_match[1]] = f"{option_match[0]} field"
-            options = json.dumps(options_dict, indent=2)
+        # Most recipes declare no options, so skip the regex unless @Option appears
+        if '@Option' in content:
+            options_dict = {match.group(2): f"{match.group(1)} field" for match in _OPTION_RE.finditer(content)}
+            if options_dict:
+                # Compact, so the CSV cell carries no indentation newlines to quote
+                options = json.dumps(options_dict, separators=(',', ':'))
         
         return {
             'displayName': display_name,
@@ -88,27 +146,53 @@ def extract_recipe_info(file_path):
         print(f"Error extracting info from {file_path}: {e}")
         return None
 
-def process_repository(repo_path, repo_name):
-    """Process a single repository and return recipe data"""
-    print(f"\n=== Processing {repo_name} ===")
-    print(f"Scanning: {repo_path}")
+def process_repositories(repositories):
+    """Process repositories in parallel and return recipe data plus per-repository counts"""
+    existing = []
+    for repo_path, repo_name in repositories:
+        if os.path.exists(repo_path):
+            existing.append((repo_path, repo_name))
+        else:
+            print(f"Warning: Repository not found: {repo_path}")
+    
+    # Directory walks are IO-bound, so scan all repositories concurrently
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        file_lists = list(executor.map(find_recipe_files, [repo_path for repo_path, _ in existing]))
     
-    recipe_files = find_recipe_files(repo_path)
-    print(f"Found {len(recipe_files)} recipe files")
+    all_paths = []
+    all_contents = []
+    file_repos = []
+    for (repo_path, repo_name), recipe_files in zip(existing, file_lists):
+        print(f"\n=== Processing {repo_name} ===")
+        print(f"Scanning: {repo_path}")
+        print(f"Found {len(recipe_files)} recipe files")
+        all_paths.extend(file_path for file_path, _ in recipe_files)
+        all_contents.extend(content for _, content in recipe_files)
+        file_repos.extend([repo_name] * len(recipe_files))
     
-    recipes_data = []
+    all_recipes = []
+    repo_summary = {repo_name: 0 for _, repo_name in existing}
     
-    for file_path in recipe_files:
-        print(f"Processing: {os.path.basename(file_path)}")
-        recipe_info = extract_recipe_info(file_path)
-        if recipe_info:
-            recipe_info['repository'] = repo_name
-            recipes_data.append(recipe_info)
+    # Extraction is CPU-bound regex work; map preserves the input order
+    with ProcessPoolExecutor() as executor:
+        for repo_name, recipe_info in zip(file_repos, executor.map(extract_recipe_info, all_paths, all_contents, chunksize=32)):
+            if recipe_info:
+                recipe_info['repository'] = repo_name
+                all_recipes.append(recipe_info)
+                repo_summary[repo_name] += 1
+    
+    for repo_name, count in repo_summary.items():
+        print(f"Extracted {count} recipes from {repo_name}")
     
-    print(f"Extracted {len(recipes_data)} recipes from {repo_name}")
-    return recipes_data
+    return all_recipes, repo_summary
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract Recipe classes from the OpenRewrite repositories into a CSV and a JSON summary")
+    parser.add_argument("--sources-archive", action="store_true", default=False,
+                        help="Store recipe source code in a sidecar .sources.zip and write sha1: references "
+                             "into the CSV instead of the source itself")
+    args = parser.parse_args(argv)
+    
     # Define all OpenRewrite repositories to scan
     repositories = [
         ("/Users/manethninduwara/Developer/openRewrite/rewrite", "rewrite-core"),
@@ -119,16 +203,7 @@ def main():
         ("/Users/manethninduwara/Developer/openRewrite/rewrite-logging-frameworks", "rewrite-logging-frameworks"),
     ]
     
-    all_recipes = []
-    repo_summary = {}
-    
-    for repo_path, repo_name in repositories:
-        if os.path.exists(repo_path):
-            repo_recipes = process_repository(repo_path, repo_name)
-            all_recipes.extend(repo_recipes)
-            repo_summary[repo_name] = len(repo_recipes)
-        else:
-            print(f"Warning: Repository not found: {repo_path}")
+    all_recipes, repo_summary = process_repositories(repositories)
     
     print(f"\n{'='*60}")
     print("COMPREHENSIVE RECIPE EXTRACTION SUMMARY")
@@ -142,7 +217,12 @@ def main():
     
     # Export comprehensive CSV
     output_file = "/Users/manethninduwara/Developer/openRewrite/RewriteRecipeSource_comprehensive.csv"
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+    # The CSV carries the full source code unless a sidecar archive is requested,
+    # in which case it holds sha1: references into the archive
+    sources_file = sources_archive_path(output_file) if args.sources_archive else None
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile, \
+         (zipfile.ZipFile(sources_file, 'w', compression=zipfile.ZIP_DEFLATED) if sources_file
+          else contextlib.nullcontext()) as sources:
         fieldnames = ['Recipe name', 'Recipe description', 'Recipe type', 'Recipe source code', 'Recipe options', 'Repository']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         
@@ -152,51 +232,56 @@ def main():
             'Recipe name': 'The name of the recipe.',
             'Recipe description': 'The description of the recipe.',
             'Recipe type': 'Differentiate between recipe types and repositories.',
-            'Recipe source code': 'The full source code of the recipe.',
+            'Recipe source code': ('Reference (sha1:<digest>) to the full source code in the sidecar sources archive.'
+                                   if sources is not None else 'The full source code of the recipe.'),
             'Recipe options': 'JSON format of recipe options.',
             'Repository': 'Source repository of the recipe.'
         })
         
-        # Write data
-        for recipe in all_recipes:
-            writer.writerow({
+        # Write data in one writerows call
+        writer.writerows(
+            {
                 'Recipe name': recipe['displayName'],
                 'Recipe description': recipe['description'],
                 'Recipe type': recipe['recipeType'],
-                'Recipe source code': recipe['sourceCode'],
+                'Recipe source code': (store_source(sources, recipe['sourceCode'])
+                                       if sources is not None else recipe['sourceCode']),
                 'Recipe options': recipe['options'],
                 'Repository': recipe['repository']
-            })
+            }
+            for recipe in all_recipes
+        )
     
     print(f"\nComprehensive data exported to: {output_file}")
+    if sources_file:
+        print(f"Recipe sources archived to: {sources_file}")
     
     # Create detailed summary JSON
     summary_file = "/Users/manethninduwara/Developer/openRewrite/comprehensive_recipe_summary.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        summary = {
-            'extractionDate': '2025-09-16',
-            'totalRecipes': total_recipes,
-            'repositorySummary': repo_summary,
-            'recipeTypes': {},
-            'recipes': [
-                {
-                    'className': recipe['className'],
-                    'displayName': recipe['displayName'],
-                    'description': recipe['description'],
-                    'recipeType': recipe['recipeType'],
-                    'repository': recipe['repository'],
-                    'filePath': recipe['filePath']
-                }
-                for recipe in all_recipes
-            ]
-        }
-        
-        # Count recipe types
-        for recipe in all_recipes:
-            recipe_type = recipe['recipeType']
-            summary['recipeTypes'][recipe_type] = summary['recipeTypes'].get(recipe_type, 0) + 1
-        
-        json.dump(summary, f, indent=2, ensure_ascii=False)
+    summary = {
+        'extractionDate': '2025-09-16',
+        'totalRecipes': total_recipes,
+        'repositorySummary': repo_summary,
+        'recipeTypes': {},
+        'recipes': [
+            {
+                'className': recipe['className'],
+                'displayName': recipe['displayName'],
+                'description': recipe['description'],
+                'recipeType': recipe['recipeType'],
+                'repository': recipe['repository'],
+                'filePath': recipe['filePath']
+            }
+            for recipe in all_recipes
+        ]
+    }
+    
+    # Count recipe types
+    for recipe in all_recipes:
+        recipe_type = recipe['recipeType']
+        summary['recipeTypes'][recipe_type] = summary['recipeTypes'].get(recipe_type, 0) + 1
+    
+    write_json(summary, summary_file)
     
     print(f"Comprehensive summary exported to: {summary_file}")
     
@@ -1,75 +1,102 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 import re
 import json
 import csv
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def find_recipe_files(root_dir):
-    """Find all Java files that extend Recipe"""
-    recipe_files = []
-    
-    for root, dirs, files in os.walk(root_dir):
-        # Skip build directories and other non-source directories
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'build' and d != 'target']
-        
-        for file in files:
-            if file.endswith('.java'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        # Look for classes that extend Recipe
-                        if re.search(r'class\s+\w+\s+extends\s+Recipe\b', content) or \
-                           re.search(r'class\s+\w+\s+extends\s+ScanningRecipe\b', content):
-                            recipe_files.append(file_path)
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
-    
-    return recipe_files
+from recipe_io import iter_java_files, read_recipe_source, write_json
+
+# Optional DFA-based engine for recipe detection; re is the fallback
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Compiled once at import instead of going through the re module cache per file.
+# Detection runs on the raw bytes of every candidate file, so it gets RE2's
+# linear-time scan when available
+_RECIPE_CLASS_RE = (re2 or re).compile(rb'class\s+\w+\s+extends\s+(?:Recipe|ScanningRecipe)\b')
+# Class name, display name and description in one scan; each alternative
+# carries exactly one named group, so match.lastgroup says which one hit
+_RECIPE_INFO_RE = re.compile(
+    r'(?:public\s+)?(?:abstract\s+)?class\s+(?P<className>\w+)\s+extends\s+(?:Recipe|ScanningRecipe)'
+    r'|getDisplayName\(\)\s*\{\s*return\s+"(?P<displayName>[^"]+)"'
+    r'|getDescription\(\)\s*\{\s*return\s+"(?P<description>[^"]+)"'
+)
+# The annotation body is scanned lazily up to a ')' that is followed by the
+# field declaration. String literals and {...} array initialisers count as
+# single units, so parentheses, braces and semicolons inside them (as in
+# valid = {"a", "b"} or a description mentioning `;`) don't end it early
+_OPTION_RE = re.compile(
+    r'@Option\b(?:"(?:[^"\\]|\\.)*"|\{[^{}]*\}|[^";{}])*?\)\s*(?:\w+\s+)*?(\w+)\s+(\w+)\s*;',
+    re.DOTALL
+)
+
+def is_recipe_source(data):
+    """Tell whether raw file bytes (or an mmap) containing 'extends' declare a Recipe subclass"""
+    # Cheap substring prefilter: most files can't match, so skip the regex
+    # for them. 'extends' was already checked by read_recipe_source; the
+    # regex allows any whitespace between the two words
+    if data.find(b'Recipe') == -1:
+        return False
+    # The stdlib engine scans an mmap in place; RE2 needs a bytes object
+    return bool(_RECIPE_CLASS_RE.search(data if re2 is None else bytes(data)))
 
 def extract_recipe_info(file_path):
-    """Extract recipe information from a Java file"""
+    """Extract recipe information from a Java file, or None if it declares no Recipe subclass
+    
+    The file is read exactly once and files without a Recipe subclass are
+    rejected on the raw bytes, before any decoding.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract class name
-        class_match = re.search(r'(?:public\s+)?(?:abstract\s+)?class\s+(\w+)\s+extends\s+(?:Recipe|ScanningRecipe)', content)
-        if not class_match:
+        # Look for classes that extend Recipe; rejected files are never decoded
+        raw = read_recipe_source(file_path, is_recipe_source)
+        if raw is None:
             return None
         
-        class_name = class_match.group(1)
+        content = raw.decode('utf-8')
+        # Same newline translation as reading in text mode
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        
+        # Extract class name, getDisplayName() and getDescription() in one pass,
+        # keeping the first occurrence of each
+        found = {}
+        for match in _RECIPE_INFO_RE.finditer(content):
+            found.setdefault(match.lastgroup, match.group(match.lastgroup))
+            if len(found) == 3:
+                break
         
-        # Extract display name from getDisplayName() method
-        display_name_match = re.search(r'getDisplayName\(\)\s*\{\s*return\s+"([^"]+)"', content)
-        display_name = display_name_match.group(1) if display_name_match else class_name
+        if 'className' not in found:
+            return None
         
-        # Extract description from getDescription() method
-        description_match = re.search(r'getDescription\(\)\s*\{\s*return\s+"([^"]+)"', content)
-        description = description_match.group(1) if description_match else ""
+        class_name = found['className']
+        display_name = found.get('displayName', class_name)
+        description = found.get('description', "")
         
-        # Determine recipe type
-        recipe_type = "Java"
-        if "Refaster" in content:
-            recipe_type = "Refaster"
+        # Determine recipe type. Each keyword test here and in the prefilter is
+        # a C-level substring search; folding them into one multi-pattern pass
+        # iterates matches in Python and measured several times slower
+        recipe_type = "Refaster" if "Refaster" in content else "Java"
         
         # Extract options (this is simplified - real implementation would be more complex)
-        options = "{}"
-        option_matches = re.findall(r'@Option\s*\([^)]+\)\s*(?:\w+\s+)*(\w+)\s+(\w+);', content)
-        if option_matches:
-            options_dict = {}
-            for option_match in option_matches:
-                options_dict[option_match[1]] = f"{option_match[0]} field"
-            options = json.dumps(options_dict, indent=2)
+        # Kept as a dict (None when empty); it is only serialized when the CSV row is written
+        options_dict = {}
+        # Most recipes declare no options, so skip the regex unless @Option appears
+        if '@Option' in content:
+            options_dict = {match.group(2): f"{match.group(1)} field" for match in _OPTION_RE.finditer(content)}
         
         return {
             'displayName': display_name,
             'description': description,
             'recipeType': recipe_type,
             'sourceCode': content,
-            'options': options,
+            'options': options_dict or None,
             'className': class_name,
             'filePath': file_path
         }
@@ -78,77 +105,107 @@ def extract_recipe_info(file_path):
         print(f"Error extracting info from {file_path}: {e}")
         return None
 
-def main():
-    # Set the root directory to the rewrite project
-    root_dir = "/Users/manethninduwara/Developer/openRewrite/rewrite-all"
-    
-    print("Scanning for Recipe classes...")
-    recipe_files = find_recipe_files(root_dir)
-    print(f"Found {len(recipe_files)} recipe files")
-    
-    recipes_data = []
+def extract_recipe_batch(file_paths):
+    """Run extract_recipe_info over a batch of files in one worker task"""
+    return [extract_recipe_info(file_path) for file_path in file_paths]
+
+def iter_extracted_recipes(executor, file_paths, workers, batch_size=32):
+    """Yield the recipes found in file_paths, in file order, as workers finish them
     
-    for file_path in recipe_files:
-        print(f"Processing: {file_path}")
-        recipe_info = extract_recipe_info(file_path)
-        if recipe_info:
-            recipes_data.append(recipe_info)
+    Unlike executor.map, which submits every file up front, at most two
+    batches per worker are in flight, so finished recipes (and their source
+    code) cannot pile up in memory while the consumer catches up.
+    """
+    pending = deque()
+    for start in range(0, len(file_paths), batch_size):
+        if len(pending) >= 2 * workers:
+            yield from filter(None, pending.popleft().result())
+        pending.append(executor.submit(extract_recipe_batch, file_paths[start:start + batch_size]))
+    while pending:
+        yield from filter(None, pending.popleft().result())
+
+def emit_recipe(recipe, writer, summary_recipes, type_counts):
+    """Write recipe as a CSV row and record its metadata and type for the summary"""
+    writer.writerow((
+        recipe['displayName'],
+        recipe['description'],
+        recipe['recipeType'],
+        recipe['sourceCode'],
+        json.dumps(recipe['options'], separators=(',', ':')) if recipe['options'] else '{}'
+    ))
+    # Keep only the small metadata fields for the summary
+    summary_recipes.append({
+        'className': recipe['className'],
+        'displayName': recipe['displayName'],
+        'description': recipe['description'],
+        'filePath': recipe['filePath'],
+        'recipeType': recipe['recipeType']
+    })
+    type_counts[recipe['recipeType']] += 1
+
+# CSV columns, followed in the file by a row describing each column
+FIELDNAMES = ('Recipe name', 'Recipe description', 'Recipe type', 'Recipe source code', 'Recipe options')
+HEADER_DESCRIPTIONS = (
+    'The name of the recipe.',
+    'The description of the recipe.',
+    'Differentiate between Java and YAML recipes, as they may be two independent data sets used in LLM fine-tuning.',
+    'The full source code of the recipe.',
+    'JSON format of recipe options.'
+)
+
+# Defaults for the command-line paths
+DEFAULT_BASE_DIR = Path("/Users/manethninduwara/Developer/openRewrite")
+DEFAULT_ROOT_DIR = DEFAULT_BASE_DIR / "rewrite-all"
+DEFAULT_OUTPUT_CSV = DEFAULT_BASE_DIR / "RewriteRecipeSource_all.csv"
+DEFAULT_SUMMARY_JSON = DEFAULT_BASE_DIR / "recipe_summary_spring.json"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract OpenRewrite Recipe classes into a CSV and a JSON summary")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT_DIR,
+                        help="Source tree to scan for Recipe classes")
+    parser.add_argument("--out-csv", type=Path, default=DEFAULT_OUTPUT_CSV, help="Output CSV file")
+    parser.add_argument("--out-json", type=Path, default=DEFAULT_SUMMARY_JSON, help="Output summary JSON file")
+    args = parser.parse_args(argv)
     
-    print(f"Extracted information from {len(recipes_data)} recipes")
+    print("Scanning for Recipe classes...")
+    java_files = list(iter_java_files(args.root))
+    print(f"Found {len(java_files)} Java files")
     
-    # Export to CSV
-    output_file = "/Users/manethninduwara/Developer/openRewrite/RewriteRecipeSource_all.csv"
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['Recipe name', 'Recipe description', 'Recipe type', 'Recipe source code', 'Recipe options']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    # Export to CSV, writing each row as soon as its recipe is extracted so
+    # that no recipe's source code is held past its own row. Recipe detection
+    # and extraction are CPU-bound regex work, so spread them over all cores;
+    # each worker reads its files once, and rows stay in file order.
+    workers = os.cpu_count() or 1
+    print(f"Processing {len(java_files)} files on {workers} workers")
+    output_file = args.out_csv
+    summary_recipes = []
+    type_counts = Counter()
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile, \
+         ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = csv.writer(csvfile)
         
         # Write header with descriptions
-        writer.writeheader()
-        writer.writerow({
-            'Recipe name': 'The name of the recipe.',
-            'Recipe description': 'The description of the recipe.',
-            'Recipe type': 'Differentiate between Java and YAML recipes, as they may be two independent data sets used in LLM fine-tuning.',
-            'Recipe source code': 'The full source code of the recipe.',
-            'Recipe options': 'JSON format of recipe options.'
-        })
+        writer.writerow(FIELDNAMES)
+        writer.writerow(HEADER_DESCRIPTIONS)
         
-        # Write data
-        for recipe in recipes_data:
-            writer.writerow({
-                'Recipe name': recipe['displayName'],
-                'Recipe description': recipe['description'],
-                'Recipe type': recipe['recipeType'],
-                'Recipe source code': recipe['sourceCode'],
-                'Recipe options': recipe['options']
-            })
+        # Write data, as tuples in FIELDNAMES order
+        for recipe in iter_extracted_recipes(executor, java_files, workers):
+            emit_recipe(recipe, writer, summary_recipes, type_counts)
     
+    print(f"Extracted information from {len(summary_recipes)} recipes")
     print(f"Data exported to: {output_file}")
-    print(f"Total recipes processed: {len(recipes_data)}")
+    print(f"Total recipes processed: {len(summary_recipes)}")
     
     # Also create a summary JSON file
-    summary_file = "/Users/manethninduwara/Developer/openRewrite/recipe_summary_spring.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        summary = {
-            'totalRecipes': len(recipes_data),
-            'recipeTypes': {},
-            'recipes': [
-                {
-                    'className': recipe['className'],
-                    'displayName': recipe['displayName'],
-                    'description': recipe['description'],
-                    'filePath': recipe['filePath'],
-                    'recipeType': recipe['recipeType']
-                }
-                for recipe in recipes_data
-            ]
-        }
-        
-        # Count recipe types
-        for recipe in recipes_data:
-            recipe_type = recipe['recipeType']
-            summary['recipeTypes'][recipe_type] = summary['recipeTypes'].get(recipe_type, 0) + 1
-        
-        json.dump(summary, f, indent=2, ensure_ascii=False)
+    summary_file = args.out_json
+    summary = {
+        'totalRecipes': len(summary_recipes),
+        # Counted as rows were written; keys stay in first-seen order
+        'recipeTypes': dict(type_counts),
+        'recipes': summary_recipes
+    }
+    
+    write_json(summary, summary_file)
     
     print(f"Summary exported to: {summary_file}")
 
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+recipe_io.py
+
+File helpers shared by the extraction and conversion scripts: walking a
+source tree for Java files, reading recipe sources, and writing JSON.
+
+JSON output is written 2-space indented, using orjson when it is installed
+and the stdlib json module otherwise; both produce the same bytes.
+"""
+
+import json
+import mmap
+import os
+from pathlib import Path
+
+# Optional faster JSON encoder; the stdlib json module is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_json(obj) -> bytes:
+    """Encode obj as 2-space indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+def write_json(obj, path):
+    """Write obj to path as 2-space indented UTF-8 JSON."""
+    Path(path).write_bytes(encode_json(obj))
+
+# Directory names never descended into, besides hidden ones (.git, .idea,
+# .gradle, ...): Gradle/Maven build and target, IntelliJ out, Eclipse bin,
+# and node_modules
+SKIP_DIRS = frozenset({"build", "target", "out", "bin", "node_modules"})
+
+def iter_java_files(root_dir):
+    """Yield .java file paths under root_dir in os.walk order, skipping SKIP_DIRS and hidden directories."""
+    stack = [root_dir]
+    
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        try:
+            # DirEntry caches the file type from the directory read, so no extra stat calls
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if not name.startswith(".") and name not in SKIP_DIRS:
+                            subdirs.append(entry.path)
+                    elif name.endswith(".java"):
+                        yield entry.path
+        except OSError:
+            # Unreadable directories are skipped, as os.walk does
+            continue
+        # Reversed so subdirectories are popped in listing order
+        stack.extend(reversed(subdirs))
+
+# Below this size a plain read is cheaper than setting up a mapping
+_MMAP_MIN_SIZE = 4096
+
+def read_recipe_source(file_path, is_recipe_source):
+    """Return the raw bytes of file_path if is_recipe_source accepts them, else None.
+    
+    is_recipe_source is called with bytes or an mmap, and only for files
+    containing "extends". Larger files are memory-mapped and matched in
+    place, so rejected files are never copied onto the Python heap.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            data = f.read()
+            # Substring check skips most files before any regex
+            return data if b"extends" in data and is_recipe_source(data) else None
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # mmap's `in` only tests single bytes, so use find()
+            if mm.find(b"extends") != -1 and is_recipe_source(mm):
+                return mm[:]
+            return None
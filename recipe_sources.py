@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+recipe_sources.py
+
+Content-addressed sidecar archive for recipe source code.
+
+With ``extract_all_recipes.py --sources-archive``, instead of inlining
+every Java source file into the recipe CSV, the extractor stores each
+source once in a zip archive next to the CSV, keyed by its SHA-1, and
+writes a ``sha1:<digest>`` reference into the "Recipe source code" column.
+By default the CSV keeps the full source code and no archive is written.
+
+Readers resolve references lazily, one row at a time; cells that are not
+references are returned unchanged, so CSVs with inline source code keep
+working. A reference whose archive is missing is an error.
+
+    RewriteRecipeSource_comprehensive.csv
+    RewriteRecipeSource_comprehensive.sources.zip
+"""
+
+import hashlib
+import zipfile
+from pathlib import Path
+
+SOURCE_REF_PREFIX = "sha1:"
+
+def sources_archive_path(csv_path) -> Path:
+    """Sidecar archive path for a recipe CSV (``X.csv`` -> ``X.sources.zip``)."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + ".sources.zip")
+
+def store_source(archive: zipfile.ZipFile, source: str) -> str:
+    """Add source to an archive opened for writing and return its CSV reference."""
+    data = source.encode("utf-8")
+    digest = hashlib.sha1(data).hexdigest()
+    try:
+        archive.getinfo(digest)
+    except KeyError:
+        archive.writestr(digest, data)
+    return SOURCE_REF_PREFIX + digest
+
+def open_sources(csv_path):
+    """Open the sidecar archive of csv_path for reading, or return None if there is none."""
+    archive_path = sources_archive_path(csv_path)
+    return zipfile.ZipFile(archive_path) if archive_path.exists() else None
+
+def resolve_source(archive, cell: str, csv_path) -> str:
+    """Return the source code for a CSV cell of csv_path, loading it from archive if the cell is a reference."""
+    if not cell.startswith(SOURCE_REF_PREFIX):
+        return cell
+    # Java source never starts with the prefix, so this is a reference whose
+    # sidecar was not copied along with the CSV
+    if archive is None:
+        raise FileNotFoundError(
+            f"{csv_path} references recipe source {cell}, but its sources archive "
+            f"{sources_archive_path(csv_path)} does not exist"
+        )
+    return archive.read(cell[len(SOURCE_REF_PREFIX):]).decode("utf-8")